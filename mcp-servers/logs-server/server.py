@@ -5,7 +5,15 @@ Provides tools to read and search application logs
 """
 
 import os
+import re
 import asyncio
+import time
+import calendar
+import hashlib
+import tempfile
+from collections import deque
+from datetime import datetime
+import numpy as np
 from mcp.server import Server
 from mcp.types import Tool, TextContent
 from mcp.server.stdio import stdio_server
@@ -13,6 +21,333 @@ from mcp.server.stdio import stdio_server
 # Data directory
 DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
 
+# Live tailing: max lines kept in memory per file, and how far back to start on first open
+TAIL_BUFFER_LINES = 2000
+TAIL_INITIAL_BYTES = 256 * 1024
+
+# Bytes at the start of a log hashed to detect a reused inode or rewritten file
+CACHE_HEAD_BYTES = 4096
+
+
+class LogTail:
+    """Incremental reader for one log file
+
+    Buffers recent lines as (start_offset, line); each refresh reads only new bytes.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.inode = None
+        self.offset = 0
+        self.partial = b""
+        self.head = b""
+        self.generation = 0
+        self.lines = deque(maxlen=TAIL_BUFFER_LINES)
+
+    def refresh(self):
+        """Read any new bytes and return True if the file was rotated"""
+        stat = os.stat(self.path)
+        rotated = False
+
+        with open(self.path, 'rb') as f:
+            if self.inode is None:
+                # First open: only load the recent tail of the file
+                self.inode = stat.st_ino
+                self.offset = max(0, stat.st_size - TAIL_INITIAL_BYTES)
+                skip_first = self.offset > 0
+            elif (stat.st_ino != self.inode or stat.st_size < self.offset
+                    or f.read(len(self.head)) != self.head):
+                # New inode, truncated, or rewritten (copytruncate + regrowth)
+                self.inode = stat.st_ino
+                self.offset = 0
+                self.partial = b""
+                self.lines.clear()
+                self.generation += 1
+                skip_first = False
+                rotated = True
+            else:
+                skip_first = False
+
+            if len(self.head) < CACHE_HEAD_BYTES:
+                f.seek(0)
+                self.head = f.read(CACHE_HEAD_BYTES)
+
+            if stat.st_size == self.offset:
+                return rotated
+
+            f.seek(self.offset)
+            data = f.read()
+
+        line_start = self.offset - len(self.partial)
+        data = self.partial + data
+        self.offset += len(data) - len(self.partial)
+
+        *complete, self.partial = data.split(b"\n")
+
+        if skip_first and complete:
+            # Started mid-line; drop the fragment
+            line_start += len(complete.pop(0)) + 1
+
+        for raw in complete:
+            self.lines.append((line_start, raw.decode('utf-8', 'replace').rstrip("\r")))
+            line_start += len(raw) + 1
+
+        return rotated
+
+    def cursor(self, offset=None):
+        """Cursor string for the given offset (default: end of the data read so far)"""
+        if offset is None:
+            offset = self.offset - len(self.partial)
+        return f"{self.inode}:{offset}:{self.generation}"
+
+
+# Open tails and parsed log columns by file path
+tails = {}
+columns = {}
+
+
+def parse_cursor(cursor):
+    """Parse an 'inode:offset:generation' cursor, returning (None, 0, None) if missing or invalid"""
+    try:
+        inode, offset, generation = cursor.split(":")
+        return int(inode), int(offset), int(generation)
+    except (AttributeError, ValueError):
+        return None, 0, None
+
+
+# Structured log lines, e.g. "2026-02-17 14:45:23 ERROR [api] POST /api/checkout 500 1234ms"
+LINE_RE = re.compile(r'^(\d{4}-\d{2}-\d{2})[ T](\d{2}:\d{2}:\d{2})\S*\s+([A-Za-z]+)\s+(?:\[([^\]]+)\])?')
+STATUS_RE = re.compile(
+    r'(?:status(?:_code)?[=:\s]+|HTTP/[\d.]+"?\s+|\b(?:GET|POST|PUT|PATCH|DELETE)\s+\S+\s+|\breturned\s+)([1-5]\d\d)\b',
+    re.IGNORECASE
+)
+LATENCY_RE = re.compile(r'\b(\d+(?:\.\d+)?)\s*ms\b')
+
+
+def to_epoch(date_text, time_text):
+    """Convert 'YYYY-MM-DD', 'HH:MM:SS' to epoch seconds (UTC)"""
+    return calendar.timegm(datetime.strptime(f"{date_text} {time_text}", "%Y-%m-%d %H:%M:%S").timetuple())
+
+
+class LogColumns:
+    """Columnar view of a log file's parsed fields
+
+    Cached next to the log as '<file>.cache.npz'; rewritten only once the
+    row count has doubled, so refreshes stay O(new data).
+    """
+
+    FIELDS = (
+        ("ts", np.int64),
+        ("level", np.int16),
+        ("service", np.int16),
+        ("status", np.int16),
+        ("latency", np.float32)
+    )
+
+    def __init__(self, path):
+        self.path = path
+        self.cache_path = path + ".cache.npz"
+        self.reset()
+        self.load()
+
+    def reset(self):
+        self.inode = None
+        self.offset = 0
+        self.head_len = 0
+        self.head = hashlib.sha1(b"").hexdigest()
+        self.levels = []
+        self.services = []
+        self.rows = 0
+        self.saved_rows = 0
+        self.buffers = {field: np.empty(0, dtype=dtype) for field, dtype in self.FIELDS}
+
+    # Column views over the filled rows
+    @property
+    def ts(self):
+        return self.buffers["ts"][:self.rows]
+
+    @property
+    def level(self):
+        return self.buffers["level"][:self.rows]
+
+    @property
+    def service(self):
+        return self.buffers["service"][:self.rows]
+
+    @property
+    def status(self):
+        return self.buffers["status"][:self.rows]
+
+    @property
+    def latency(self):
+        return self.buffers["latency"][:self.rows]
+
+    def load(self):
+        """Load the on-disk cache if present"""
+        if not os.path.exists(self.cache_path):
+            return
+
+        try:
+            with np.load(self.cache_path, allow_pickle=False) as data:
+                self.inode = int(data["inode"])
+                self.offset = int(data["offset"])
+                self.head_len = int(data["head_len"])
+                self.head = str(data["head"])
+                self.levels = data["levels"].tolist()
+                self.services = data["services"].tolist()
+                self.buffers = {field: data[field] for field, dtype in self.FIELDS}
+                self.rows = self.saved_rows = len(self.buffers["ts"])
+        except Exception:
+            # Unreadable or outdated cache: rebuild from the log
+            self.reset()
+
+    def save(self):
+        """Write the cache atomically; failures (e.g. read-only directory) are ignored"""
+        try:
+            fd, tmp_path = tempfile.mkstemp(
+                dir=os.path.dirname(self.cache_path),
+                prefix=os.path.basename(self.cache_path) + ".",
+                suffix=".tmp"
+            )
+        except OSError:
+            return
+
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(
+                    f,
+                    inode=self.inode,
+                    offset=self.offset,
+                    head_len=self.head_len,
+                    head=self.head,
+                    levels=np.array(self.levels, dtype=str),
+                    services=np.array(self.services, dtype=str),
+                    **{field: getattr(self, field) for field, dtype in self.FIELDS}
+                )
+            os.replace(tmp_path, self.cache_path)
+            self.saved_rows = self.rows
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def code(self, vocab, value):
+        if value not in vocab:
+            vocab.append(value)
+        return vocab.index(value)
+
+    def append(self, rows):
+        """Append parsed rows, growing the buffers by doubling when full"""
+        needed = self.rows + len(rows)
+
+        if needed > len(self.buffers["ts"]):
+            capacity = max(needed, 2 * len(self.buffers["ts"]), 1024)
+            for field, dtype in self.FIELDS:
+                grown = np.empty(capacity, dtype=dtype)
+                grown[:self.rows] = self.buffers[field][:self.rows]
+                self.buffers[field] = grown
+
+        for (field, dtype), values in zip(self.FIELDS, zip(*rows)):
+            self.buffers[field][self.rows:needed] = values
+
+        self.rows = needed
+
+    def refresh(self):
+        """Parse any complete lines appended since the last refresh"""
+        stat = os.stat(self.path)
+
+        with open(self.path, 'rb') as f:
+            if (stat.st_ino != self.inode or stat.st_size < self.offset
+                    or hashlib.sha1(f.read(self.head_len)).hexdigest() != self.head):
+                # New, rotated, truncated or rewritten file: rebuild
+                self.reset()
+                self.inode = stat.st_ino
+
+            if stat.st_size == self.offset:
+                return
+
+            f.seek(self.offset)
+            data = f.read()
+
+            # Only parse up to the last complete line
+            end = data.rfind(b"\n") + 1
+            if end == 0:
+                return
+
+            rows = []
+            for raw in data[:end].decode('utf-8', 'replace').splitlines():
+                match = LINE_RE.match(raw)
+                if not match:
+                    continue
+
+                date_text, time_text, level, service = match.groups()
+                level = level.upper()
+                if level == "WARNING":
+                    level = "WARN"
+
+                status = STATUS_RE.search(raw)
+                latency = LATENCY_RE.search(raw)
+
+                rows.append((
+                    to_epoch(date_text, time_text),
+                    self.code(self.levels, level),
+                    self.code(self.services, service or "-"),
+                    int(status.group(1)) if status else 0,
+                    float(latency.group(1)) if latency else np.nan
+                ))
+
+            self.offset += end
+
+            if self.head_len < CACHE_HEAD_BYTES:
+                f.seek(0)
+                head = f.read(min(CACHE_HEAD_BYTES, self.offset))
+                self.head_len = len(head)
+                self.head = hashlib.sha1(head).hexdigest()
+
+        if rows:
+            self.append(rows)
+
+        if self.saved_rows == 0 or self.rows >= 2 * self.saved_rows:
+            self.save()
+
+
+def group_latency(latency, inverse, n_groups, metric):
+    """Aggregate latency ('avg', 'max' or 'pNN') per group index; None for groups without values"""
+    valid = ~np.isnan(latency)
+    latency, inverse = latency[valid], inverse[valid]
+    counts = np.bincount(inverse, minlength=n_groups)
+
+    if metric == "avg":
+        sums = np.bincount(inverse, weights=latency, minlength=n_groups)
+        return [float(sums[i] / counts[i]) if counts[i] else None for i in range(n_groups)]
+
+    # Sort rows by group once and split on the group boundaries
+    order = np.argsort(inverse, kind="stable")
+    chunks = np.split(latency[order], np.cumsum(counts)[:-1])
+
+    if metric == "max":
+        return [float(chunk.max()) if len(chunk) else None for chunk in chunks]
+    return [float(np.percentile(chunk, float(metric[1:]))) if len(chunk) else None for chunk in chunks]
+
+
+def parse_time(value, reference_ts):
+    """Parse 'HH:MM[:SS]' (on the reference day) or a full timestamp to epoch seconds"""
+    value = value.strip().rstrip("Z")
+
+    if re.fullmatch(r'\d{1,2}:\d{2}(:\d{2})?', value):
+        day = time.strftime("%Y-%m-%d", time.gmtime(reference_ts))
+        if value.count(":") == 1:
+            value += ":00"
+        return to_epoch(day, value.zfill(8))
+
+    parsed = datetime.fromisoformat(value.replace("T", " "))
+
+    if parsed.tzinfo is not None:
+        return int(parsed.timestamp())
+    return calendar.timegm(parsed.timetuple())
+
+
 # Create server
 app = Server("logs-server")
 
@@ -53,6 +388,78 @@ async def list_tools() -> list[Tool]:
                 },
                 "required": ["pattern"]
             }
+        ),
+        Tool(
+            name="tail_logs",
+            description="Follow a log file: return only new lines (optionally matching a pattern) since the given cursor",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "pattern": {
+                        "type": "string",
+                        "description": "Only return lines containing this pattern (e.g., 'ERROR')",
+                        "default": ""
+                    },
+                    "file": {
+                        "type": "string",
+                        "description": "Log file to follow",
+                        "default": "app.log"
+                    },
+                    "cursor": {
+                        "type": "string",
+                        "description": "Cursor from a previous tail_logs call; omit to get the most recent lines"
+                    },
+                    "limit": {
+                        "type": "number",
+                        "description": "Maximum number of lines to return",
+                        "default": 50
+                    }
+                }
+            }
+        ),
+        Tool(
+            name="query_logs",
+            description="Filter and aggregate parsed log fields (time, level, service, HTTP status, latency), e.g. count 5xx per minute since 14:30 or p99 latency by service",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "file": {
+                        "type": "string",
+                        "description": "Log file to query",
+                        "default": "app.log"
+                    },
+                    "level": {
+                        "type": "string",
+                        "description": "Comma-separated log levels (e.g., 'ERROR' or 'ERROR,WARN')"
+                    },
+                    "service": {
+                        "type": "string",
+                        "description": "Service name in brackets (e.g., 'api')"
+                    },
+                    "status": {
+                        "type": "string",
+                        "description": "HTTP status code or class (e.g., '500' or '5xx')"
+                    },
+                    "since": {
+                        "type": "string",
+                        "description": "Start time, 'HH:MM' or full timestamp (inclusive)"
+                    },
+                    "until": {
+                        "type": "string",
+                        "description": "End time, 'HH:MM' or full timestamp (exclusive)"
+                    },
+                    "group_by": {
+                        "type": "string",
+                        "description": "Group results by: none, minute, level, service, status",
+                        "default": "none"
+                    },
+                    "metric": {
+                        "type": "string",
+                        "description": "Value per group: count, or latency avg, max, p50, p95, p99",
+                        "default": "count"
+                    }
+                }
+            }
         )
     ]
 
@@ -108,6 +515,211 @@ async def call_tool(name: str, arguments: dict) -> list[TextContent]:
             text=result
         )]
 
+    elif name == "tail_logs":
+        pattern = arguments.get("pattern", "")
+        file_name = arguments.get("file", "app.log")
+        file_path = os.path.join(DATA_DIR, file_name)
+
+        try:
+            limit = int(arguments.get("limit", 50))
+        except (TypeError, ValueError):
+            limit = 0
+
+        if limit < 1:
+            return [TextContent(
+                type="text",
+                text=f"Error: Invalid limit '{arguments.get('limit')}' (must be a positive number)"
+            )]
+
+        if not os.path.exists(file_path):
+            return [TextContent(
+                type="text",
+                text=f"Error: Log file '{file_name}' not found"
+            )]
+
+        tail = tails.get(file_path)
+        if tail is None:
+            tail = tails[file_path] = LogTail(file_path)
+
+        rotated = tail.refresh()
+        inode, since, generation = parse_cursor(arguments.get("cursor"))
+
+        notes = []
+        if inode is not None and (inode != tail.inode or generation != tail.generation):
+            # Cursor refers to a previous (rotated) file
+            notes.append("Log file was rotated; showing lines from the new file")
+            since = 0
+        elif rotated or since > tail.offset - len(tail.partial):
+            # Rotated on this refresh, or the cursor points past the end of a
+            # file that was truncated during an earlier call
+            notes.append("Log file was rotated or truncated; showing lines from the start")
+            since = 0
+
+        if inode is not None and tail.lines and tail.lines[0][0] > since:
+            notes.append("Some lines since the cursor are no longer buffered")
+
+        matches = [
+            (start, line) for start, line in tail.lines
+            if start >= since and pattern.lower() in line.lower()
+        ]
+
+        skipped = 0
+        next_cursor = tail.cursor()
+
+        if inode is None:
+            # No cursor: just the most recent matches
+            matches = matches[-limit:]
+        elif len(matches) > limit:
+            # Resume right after the last returned line
+            skipped = len(matches) - limit
+            matches = matches[:limit]
+            next_cursor = tail.cursor(matches[-1][0] + 1)
+
+        result = "\n".join(notes + [""]) if notes else ""
+
+        if matches:
+            result += f"Found {len(matches)} new lines"
+            result += f" matching '{pattern}'" if pattern else ""
+            result += ":\n\n" + "\n".join(line for start, line in matches)
+            if skipped:
+                result += f"\n\n... {skipped} more lines, call again with the cursor below"
+        else:
+            result += "No new lines"
+            result += f" matching '{pattern}'" if pattern else ""
+
+        result += f"\n\nCursor: {next_cursor}"
+
+        return [TextContent(
+            type="text",
+            text=result
+        )]
+
+    elif name == "query_logs":
+        file_name = arguments.get("file", "app.log")
+        group_by = arguments.get("group_by", "none")
+        metric = arguments.get("metric", "count")
+        file_path = os.path.join(DATA_DIR, file_name)
+
+        if not os.path.exists(file_path):
+            return [TextContent(
+                type="text",
+                text=f"Error: Log file '{file_name}' not found"
+            )]
+
+        if group_by not in ("none", "minute", "level", "service", "status"):
+            return [TextContent(
+                type="text",
+                text=f"Error: Unknown group_by '{group_by}'"
+            )]
+
+        if metric not in ("count", "avg", "max") and not re.fullmatch(r'p\d{1,2}(\.\d+)?', metric):
+            return [TextContent(
+                type="text",
+                text=f"Error: Unknown metric '{metric}'"
+            )]
+
+        cols = columns.get(file_path)
+        if cols is None:
+            cols = columns[file_path] = LogColumns(file_path)
+        cols.refresh()
+
+        if len(cols.ts) == 0:
+            return [TextContent(
+                type="text",
+                text=f"No structured log lines found in '{file_name}'"
+            )]
+
+        mask = np.ones(len(cols.ts), dtype=bool)
+        filters = []
+
+        if arguments.get("level"):
+            wanted = [level.strip().upper().replace("WARNING", "WARN") for level in arguments["level"].split(",")]
+            codes = [cols.levels.index(level) for level in wanted if level in cols.levels]
+            mask &= np.isin(cols.level, codes)
+            filters.append(f"level={','.join(wanted)}")
+
+        if arguments.get("service"):
+            service = arguments["service"]
+            code = cols.services.index(service) if service in cols.services else -1
+            mask &= cols.service == code
+            filters.append(f"service={service}")
+
+        if arguments.get("status"):
+            status = str(arguments["status"]).lower()
+            if re.fullmatch(r'[1-5]xx', status):
+                low = int(status[0]) * 100
+                mask &= (cols.status >= low) & (cols.status < low + 100)
+            elif status.isdigit():
+                mask &= cols.status == int(status)
+            else:
+                return [TextContent(
+                    type="text",
+                    text=f"Error: Invalid status '{status}'"
+                )]
+            filters.append(f"status={status}")
+
+        try:
+            if arguments.get("since"):
+                mask &= cols.ts >= parse_time(arguments["since"], int(cols.ts[-1]))
+                filters.append(f"since={arguments['since']}")
+            if arguments.get("until"):
+                mask &= cols.ts < parse_time(arguments["until"], int(cols.ts[-1]))
+                filters.append(f"until={arguments['until']}")
+        except ValueError as e:
+            return [TextContent(
+                type="text",
+                text=f"Error: Invalid time - {str(e)}"
+            )]
+
+        selected = np.flatnonzero(mask)
+        result = f"Query on '{file_name}'"
+        result += f" ({', '.join(filters)})" if filters else ""
+        result += f": {len(selected)} matching lines\n\n"
+
+        if group_by == "none":
+            if metric != "count":
+                values = cols.latency[selected]
+                value = group_latency(values, np.zeros(len(values), dtype=np.intp), 1, metric)[0]
+                result += f"Latency {metric}: " + (f"{value:.1f}ms" if value is not None else "n/a")
+            return [TextContent(type="text", text=result.rstrip())]
+
+        if group_by == "minute":
+            keys = cols.ts[selected] // 60
+        else:
+            keys = getattr(cols, group_by)[selected]
+
+        groups, inverse = np.unique(keys, return_inverse=True)
+        counts = np.bincount(inverse, minlength=len(groups))
+
+        result += f"{group_by.capitalize()} | {metric}\n"
+        result += "-" * 40 + "\n"
+
+        if metric != "count":
+            latencies = group_latency(cols.latency[selected], inverse, len(groups), metric)
+
+        for i, key in enumerate(groups[:200]):
+            if group_by == "minute":
+                label = time.strftime("%Y-%m-%d %H:%M", time.gmtime(int(key) * 60))
+            elif group_by == "level":
+                label = cols.levels[key]
+            elif group_by == "service":
+                label = cols.services[key]
+            else:
+                label = str(key) if key else "-"
+
+            if metric == "count":
+                value = str(counts[i])
+            else:
+                latency = latencies[i]
+                value = f"{latency:.1f}ms" if latency is not None else "n/a"
+
+            result += f"{label} | {value}\n"
+
+        if len(groups) > 200:
+            result += f"\n... and {len(groups) - 200} more groups"
+
+        return [TextContent(type="text", text=result.rstrip())]
+
     else:
         return [TextContent(
             type="text",
@@ -8,9 +8,14 @@ import os
 import sys
 import json
 import asyncio
+import threading
+import importlib.util
+from contextlib import asynccontextmanager
+import anyio
 import requests
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
+from mcp.shared.memory import create_client_server_memory_streams
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -21,11 +26,44 @@ OLLAMA_HOST = os.getenv('OLLAMA_HOST', 'https://ollama.com')
 OLLAMA_MODEL = os.getenv('OLLAMA_MODEL', 'qwen3-coder-next')
 OLLAMA_API_KEY = os.getenv('OLLAMA_API_KEY')
 
+
+def env_number(name, default, cast=int):
+    """Read a numeric setting from the environment, or None if it is not a valid number"""
+    try:
+        return cast(os.getenv(name, default))
+    except ValueError:
+        return None
+
+
 # MCP Servers directory
 SERVERS_DIR = os.path.join(os.path.dirname(__file__), 'mcp-servers')
 
+# MCP transport: "stdio" (one subprocess per server) or "inproc" (same process, in-memory streams)
+MCP_TRANSPORT = os.getenv('MCP_TRANSPORT', 'stdio').lower()
+MCP_TRANSPORTS = ("stdio", "inproc")
+
+# First-look pre-fetch configuration
+PREFETCH_ENABLED = os.getenv('PREFETCH_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+PREFETCH_MAX_CHARS = env_number('PREFETCH_MAX_CHARS', '1500')
 
-def call_ollama(messages, tools=None):
+# Tool loop scheduling: stall detection (0 disables) and speculative branches
+STALL_TURNS = env_number('STALL_TURNS', '2')
+SPECULATIVE_BRANCHES = env_number('SPECULATIVE_BRANCHES', '1')
+SPECULATIVE_TEMPERATURE = env_number('SPECULATIVE_TEMPERATURE', '0.7', float)
+
+# Tools whose results change over time (live log files): never cached and
+# never counted as repeated calls by stall detection
+UNCACHED_TOOLS = {"read_logs", "search_logs", "tail_logs", "query_logs"}
+
+# Tool calls that nearly every analysis starts with
+PREFETCH_CALLS = [
+    ("search_logs", {"pattern": "ERROR"}),
+    ("get_anomalies", {}),
+    ("get_deployments", {}),
+]
+
+
+def call_ollama(messages, tools=None, options=None):
     """Call Ollama Cloud API with function calling support"""
     api_url = f"{OLLAMA_HOST}/api/chat"
 
@@ -38,6 +76,9 @@ def call_ollama(messages, tools=None):
     if tools:
         payload["tools"] = tools
 
+    if options:
+        payload["options"] = options
+
     headers = {
         "Content-Type": "application/json"
     }
@@ -54,6 +95,243 @@ def call_ollama(messages, tools=None):
         raise
 
 
+async def call_ollama_async(messages, tools=None, options=None):
+    """Run call_ollama in a daemon thread so abandoned requests never delay exit"""
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def deliver(setter, value):
+        if not future.done():
+            setter(value)
+
+    def worker():
+        try:
+            response = call_ollama(messages, tools, options)
+        except Exception as e:
+            callback = (deliver, future.set_exception, e)
+        else:
+            callback = (deliver, future.set_result, response)
+
+        try:
+            loop.call_soon_threadsafe(*callback)
+        except RuntimeError:
+            # Event loop already closed (branch was abandoned)
+            pass
+
+    threading.Thread(target=worker, daemon=True).start()
+    return await future
+
+
+def load_server_module(server_name):
+    """Import an MCP server module (e.g. 'logs-server') from SERVERS_DIR"""
+    module_name = server_name.replace("-", "_")
+    path = os.path.join(SERVERS_DIR, server_name, "server.py")
+
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@asynccontextmanager
+async def inproc_client(server_name):
+    """Run an MCP server in this process and connect to it over in-memory streams"""
+    server = load_server_module(server_name).app
+
+    async with create_client_server_memory_streams() as (client_streams, server_streams):
+        server_read, server_write = server_streams
+
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(
+                server.run,
+                server_read,
+                server_write,
+                server.create_initialization_options()
+            )
+            try:
+                yield client_streams
+            finally:
+                tg.cancel_scope.cancel()
+
+
+def server_client(server_name):
+    """Return the (read, write) stream context for a server using MCP_TRANSPORT"""
+    if MCP_TRANSPORT == "inproc":
+        return inproc_client(server_name)
+
+    params = StdioServerParameters(
+        command="python",
+        args=[os.path.join(SERVERS_DIR, server_name, "server.py")]
+    )
+    return stdio_client(params)
+
+
+def compact_result(content, max_chars=None):
+    """Flatten MCP result content to text trimmed to max_chars; returns (text, trimmed)"""
+    if max_chars is None:
+        max_chars = PREFETCH_MAX_CHARS
+
+    text = "\n".join(getattr(item, "text", str(item)) for item in content)
+
+    if len(text) > max_chars:
+        return text[:max_chars] + f"\n... ({len(text) - max_chars} more characters truncated)", True
+
+    return text, False
+
+
+async def prefetch_first_look(tool_to_session, calls=PREFETCH_CALLS):
+    """Run the standard first-look tool calls in parallel across all servers
+
+    Returns (tool_name, tool_args, server_type, result_content, text, trimmed)
+    per available tool; result_content is the full result (None on error).
+    """
+    available = [(name, args) for name, args in calls if name in tool_to_session]
+
+    async def run_call(tool_name, tool_args):
+        server_type, session = tool_to_session[tool_name]
+        try:
+            result = await session.call_tool(tool_name, tool_args)
+            result_content = str(result.content)
+            text, trimmed = compact_result(result.content)
+        except Exception as e:
+            result_content = None
+            text, trimmed = f"Error: {str(e)}", False
+        return tool_name, tool_args, server_type, result_content, text, trimmed
+
+    return await asyncio.gather(*(run_call(name, args) for name, args in available))
+
+
+def tool_fingerprint(tool_name, tool_args):
+    """Stable key for a tool call, used for caching and stall detection"""
+    return f"{tool_name}:{json.dumps(tool_args, sort_keys=True, default=str)}"
+
+
+async def run_analysis_branch(messages, all_tools, tool_to_session, tool_cache, stats, label="", options=None):
+    """Run the Ollama tool calling loop and return the final answer (or None)
+
+    Forces a final answer after STALL_TURNS turns of only repeated calls.
+    """
+    max_iterations = 25
+    seen_calls = set()
+    stalled_turns = 0
+
+    for iteration in range(max_iterations):
+        try:
+            # Call Ollama (blocking HTTP, so run it off the event loop)
+            response = await call_ollama_async(messages, all_tools, options)
+
+            # Get the message from response
+            assistant_msg = response.get("message", {})
+
+            # Check if Ollama wants to use tools
+            if not assistant_msg.get("tool_calls"):
+                # No more tool calls, Ollama has finished
+                return assistant_msg.get("content", "") or None
+
+            tool_calls = assistant_msg["tool_calls"]
+
+            # Add assistant message to history
+            messages.append(assistant_msg)
+
+            # None: no cacheable calls this turn, so the stall count is unchanged
+            repeated = None
+
+            # Execute each tool call
+            for tool_call in tool_calls:
+                stats["tool_count"] += 1
+                function = tool_call.get("function", {})
+                tool_name = function.get("name")
+                tool_args = function.get("arguments", {})
+
+                # Parse arguments if string
+                if isinstance(tool_args, str):
+                    try:
+                        tool_args = json.loads(tool_args)
+                    except:
+                        pass
+
+                fingerprint = tool_fingerprint(tool_name, tool_args)
+                cacheable = tool_name not in UNCACHED_TOOLS
+
+                if cacheable:
+                    if fingerprint not in seen_calls:
+                        repeated = False
+                        seen_calls.add(fingerprint)
+                    elif repeated is None:
+                        repeated = True
+
+                # Get the appropriate session
+                if tool_name in tool_to_session:
+                    server_type, session = tool_to_session[tool_name]
+
+                    print(f"\n{label}[Tool #{stats['tool_count']}] {tool_name} ({server_type.upper()} server)")
+                    print(f"  Arguments: {tool_args}")
+
+                    if cacheable and fingerprint in tool_cache:
+                        result_content = tool_cache[fingerprint]
+                        print("  Result: (cached)")
+                        messages.append({
+                            "role": "tool",
+                            "content": result_content
+                        })
+                        continue
+
+                    stats["server_calls"][server_type] += 1
+
+                    try:
+                        # Call the appropriate MCP server
+                        result = await session.call_tool(tool_name, tool_args)
+                        result_content = str(result.content)
+                        if cacheable:
+                            tool_cache[fingerprint] = result_content
+
+                        # Show brief result
+                        preview = result_content[:200] + "..." if len(result_content) > 200 else result_content
+                        print(f"  Result: {preview}")
+
+                        # Add tool result to messages
+                        messages.append({
+                            "role": "tool",
+                            "content": result_content
+                        })
+
+                    except Exception as e:
+                        error_msg = f"Error: {str(e)}"
+                        print(f"  {error_msg}")
+                        messages.append({
+                            "role": "tool",
+                            "content": error_msg
+                        })
+                else:
+                    print(f"\n{label}[Tool #{stats['tool_count']}] {tool_name} - Unknown tool!")
+                    messages.append({
+                        "role": "tool",
+                        "content": f"Error: Unknown tool '{tool_name}'"
+                    })
+
+            # Stop a loop that keeps repeating the same calls
+            if repeated is not None:
+                stalled_turns = stalled_turns + 1 if repeated else 0
+
+            if STALL_TURNS > 0 and stalled_turns >= STALL_TURNS:
+                print(f"\n{label}Repeated tool calls detected, requesting final analysis...")
+                messages.append({
+                    "role": "user",
+                    "content": "You are repeating tool calls you have already made. Stop calling tools and give your final root cause analysis now using the data collected so far."
+                })
+                response = await call_ollama_async(messages, None, options)
+                return response.get("message", {}).get("content", "") or None
+
+        except Exception as e:
+            print(f"\n{label}Error in iteration {iteration + 1}: {e}")
+            import traceback
+            traceback.print_exc()
+            return None
+
+    print(f"\n\n{label}Reached maximum iterations ({max_iterations}).")
+    return None
+
+
 async def analyze_with_multi_mcp(incident_description):
     """Analyze incident using Ollama with 3 MCP servers"""
 
@@ -63,31 +341,15 @@ async def analyze_with_multi_mcp(incident_description):
     print(f"\nIncident: {incident_description}\n")
     print("=" * 70)
 
-    # Configure 3 MCP servers
-    logs_server_params = StdioServerParameters(
-        command="python",
-        args=[os.path.join(SERVERS_DIR, "logs-server", "server.py")]
-    )
-
-    git_server_params = StdioServerParameters(
-        command="python",
-        args=[os.path.join(SERVERS_DIR, "git-server", "server.py")]
-    )
-
-    datadog_server_params = StdioServerParameters(
-        command="python",
-        args=[os.path.join(SERVERS_DIR, "datadog-server", "server.py")]
-    )
-
-    print("\n[1/6] Starting 3 MCP servers...")
+    print(f"\n[1/6] Starting 3 MCP servers ({MCP_TRANSPORT} transport)...")
     print("  - Logs Server")
     print("  - Git Server")
     print("  - Datadog Server")
 
     # Connect to all 3 servers
-    async with stdio_client(logs_server_params) as (logs_read, logs_write), \
-               stdio_client(git_server_params) as (git_read, git_write), \
-               stdio_client(datadog_server_params) as (datadog_read, datadog_write):
+    async with server_client("logs-server") as (logs_read, logs_write), \
+               server_client("git-server") as (git_read, git_write), \
+               server_client("datadog-server") as (datadog_read, datadog_write):
 
         async with ClientSession(logs_read, logs_write) as logs_session, \
                    ClientSession(git_read, git_write) as git_session, \
@@ -172,122 +434,101 @@ Your task:
 
 Call the appropriate tools from each server to gather complete information."""
 
+            # Tool call counters, shared by all analysis branches
+            stats = {"tool_count": 0, "server_calls": {"logs": 0, "git": 0, "datadog": 0}}
+
+            # Tool results by call fingerprint, shared by all analysis branches
+            tool_cache = {}
+
+            user_msg = f"Analyze this production incident: {incident_description}"
+
+            # Pre-fetch the first-look bundle so the model starts with context
+            if PREFETCH_ENABLED:
+                print("\nPre-fetching first-look data...")
+
+                prefetched = await prefetch_first_look(tool_to_session)
+
+                if prefetched:
+                    user_msg += "\n\nInitial data already collected:"
+
+                    for tool_name, tool_args, server_type, result_content, text, trimmed in prefetched:
+                        stats["tool_count"] += 1
+                        stats["server_calls"][server_type] += 1
+
+                        # Cache the full result; only the prompt gets the compacted copy
+                        if result_content is not None and tool_name not in UNCACHED_TOOLS:
+                            tool_cache[tool_fingerprint(tool_name, tool_args)] = result_content
+                        print(f"  - {tool_name} ({server_type.upper()} server)")
+                        if trimmed:
+                            note = "(truncated - call this tool again for the full output)"
+                        elif tool_name in UNCACHED_TOOLS:
+                            note = "(snapshot of a live log - call this tool again to see new lines)"
+                        else:
+                            note = "(complete - no need to call this tool again with the same arguments)"
+
+                        user_msg += f"\n\n### {tool_name}({json.dumps(tool_args)}) {note}\n{text}"
+
             messages = [
                 {"role": "system", "content": system_msg},
-                {"role": "user", "content": f"Analyze this production incident: {incident_description}"}
+                {"role": "user", "content": user_msg}
             ]
 
             print("\n[5/6] Ollama analyzing with MCP tools...\n")
             print("=" * 70)
 
-            # Tool calling loop
-            tool_count = 0
-            max_iterations = 25
-            server_calls = {"logs": 0, "git": 0, "datadog": 0}
-
-            for iteration in range(max_iterations):
+            if SPECULATIVE_BRANCHES > 1:
+                print(f"\nRunning {SPECULATIVE_BRANCHES} speculative analysis branches...")
+
+                # Differently-seeded branches; the first one to converge wins
+                branches = [
+                    asyncio.ensure_future(run_analysis_branch(
+                        list(messages), all_tools, tool_to_session, tool_cache, stats,
+                        label=f"[Branch {i + 1}] ",
+                        options={"seed": i + 1, "temperature": SPECULATIVE_TEMPERATURE}
+                    ))
+                    for i in range(SPECULATIVE_BRANCHES)
+                ]
+
+                final_response = None
+                pending = set(branches)
+
+                while pending and not final_response:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for branch in done:
+                        if branch.result() and not final_response:
+                            final_response = branch.result()
+                            print(f"\nBranch {branches.index(branch) + 1} converged first.")
+
+                for branch in pending:
+                    branch.cancel()
+            else:
+                final_response = await run_analysis_branch(
+                    messages, all_tools, tool_to_session, tool_cache, stats
+                )
+
+            if final_response:
+                server_calls = stats["server_calls"]
+                print("\n" + "=" * 70)
+                print("[6/6] ANALYSIS COMPLETE")
+                print("=" * 70)
+                print(f"\nTotal MCP tool calls: {stats['tool_count']}")
+                print(f"  - Logs Server: {server_calls['logs']} calls")
+                print(f"  - Git Server: {server_calls['git']} calls")
+                print(f"  - Datadog Server: {server_calls['datadog']} calls")
+                print("\n" + "=" * 70)
+                print("ROOT CAUSE ANALYSIS")
+                print("=" * 70)
+
+                # Handle Unicode encoding
                 try:
-                    # Call Ollama
-                    response = call_ollama(messages, all_tools)
-
-                    # Get the message from response
-                    assistant_msg = response.get("message", {})
-
-                    # Check if Ollama wants to use tools
-                    if assistant_msg.get("tool_calls"):
-                        tool_calls = assistant_msg["tool_calls"]
-
-                        # Add assistant message to history
-                        messages.append(assistant_msg)
-
-                        # Execute each tool call
-                        for tool_call in tool_calls:
-                            tool_count += 1
-                            function = tool_call.get("function", {})
-                            tool_name = function.get("name")
-                            tool_args = function.get("arguments", {})
-
-                            # Parse arguments if string
-                            if isinstance(tool_args, str):
-                                try:
-                                    tool_args = json.loads(tool_args)
-                                except:
-                                    pass
-
-                            # Get the appropriate session
-                            if tool_name in tool_to_session:
-                                server_type, session = tool_to_session[tool_name]
-                                server_calls[server_type] += 1
-
-                                print(f"\n[Tool #{tool_count}] {tool_name} ({server_type.upper()} server)")
-                                print(f"  Arguments: {tool_args}")
-
-                                try:
-                                    # Call the appropriate MCP server
-                                    result = await session.call_tool(tool_name, tool_args)
-                                    result_content = str(result.content)
-
-                                    # Show brief result
-                                    preview = result_content[:200] + "..." if len(result_content) > 200 else result_content
-                                    print(f"  Result: {preview}")
-
-                                    # Add tool result to messages
-                                    messages.append({
-                                        "role": "tool",
-                                        "content": result_content
-                                    })
-
-                                except Exception as e:
-                                    error_msg = f"Error: {str(e)}"
-                                    print(f"  {error_msg}")
-                                    messages.append({
-                                        "role": "tool",
-                                        "content": error_msg
-                                    })
-                            else:
-                                print(f"\n[Tool #{tool_count}] {tool_name} - Unknown tool!")
-                                messages.append({
-                                    "role": "tool",
-                                    "content": f"Error: Unknown tool '{tool_name}'"
-                                })
-
-                    else:
-                        # No more tool calls, Ollama has finished
-                        final_response = assistant_msg.get("content", "")
-
-                        if final_response:
-                            print("\n" + "=" * 70)
-                            print("[6/6] ANALYSIS COMPLETE")
-                            print("=" * 70)
-                            print(f"\nTotal MCP tool calls: {tool_count}")
-                            print(f"  - Logs Server: {server_calls['logs']} calls")
-                            print(f"  - Git Server: {server_calls['git']} calls")
-                            print(f"  - Datadog Server: {server_calls['datadog']} calls")
-                            print("\n" + "=" * 70)
-                            print("ROOT CAUSE ANALYSIS")
-                            print("=" * 70)
-
-                            # Handle Unicode encoding
-                            try:
-                                print(f"\n{final_response}\n")
-                            except UnicodeEncodeError:
-                                clean_response = final_response.encode('ascii', 'ignore').decode('ascii')
-                                print(f"\n{clean_response}\n")
-
-                            print("=" * 70)
-                        else:
-                            print("\nNo final response from Ollama.")
-
-                        break
+                    print(f"\n{final_response}\n")
+                except UnicodeEncodeError:
+                    clean_response = final_response.encode('ascii', 'ignore').decode('ascii')
+                    print(f"\n{clean_response}\n")
 
-                except Exception as e:
-                    print(f"\nError in iteration {iteration + 1}: {e}")
-                    import traceback
-                    traceback.print_exc()
-                    break
-
-            if iteration >= max_iterations - 1:
-                print(f"\n\nReached maximum iterations ({max_iterations}).")
+                print("=" * 70)
+            else:
+                print("\nNo final response from Ollama.")
 
 
 def main():
@@ -302,10 +543,34 @@ def main():
         print("\nERROR: OLLAMA_API_KEY not found in .env file!")
         sys.exit(1)
 
+    # Check transport
+    if MCP_TRANSPORT not in MCP_TRANSPORTS:
+        print(f"\nERROR: Unknown MCP_TRANSPORT '{MCP_TRANSPORT}' (expected one of: {', '.join(MCP_TRANSPORTS)})")
+        sys.exit(1)
+
+    # Check pre-fetch settings
+    if PREFETCH_MAX_CHARS is None or PREFETCH_MAX_CHARS < 1:
+        print("\nERROR: PREFETCH_MAX_CHARS must be a whole number >= 1")
+        sys.exit(1)
+
+    # Check tool loop settings
+    if STALL_TURNS is None or STALL_TURNS < 0:
+        print("\nERROR: STALL_TURNS must be a whole number >= 0 (0 disables stall detection)")
+        sys.exit(1)
+
+    if SPECULATIVE_BRANCHES is None or SPECULATIVE_BRANCHES < 1:
+        print("\nERROR: SPECULATIVE_BRANCHES must be a whole number >= 1")
+        sys.exit(1)
+
+    if SPECULATIVE_TEMPERATURE is None or SPECULATIVE_TEMPERATURE < 0:
+        print("\nERROR: SPECULATIVE_TEMPERATURE must be a number >= 0")
+        sys.exit(1)
+
     print(f"\nConfiguration:")
     print(f"  Host: {OLLAMA_HOST}")
     print(f"  Model: {OLLAMA_MODEL}")
     print(f"  API Key: {OLLAMA_API_KEY[:20]}...")
+    print(f"  Transport: {MCP_TRANSPORT}")
 
     # Get incident description
     if len(sys.argv) > 1: